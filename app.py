@@ -1,11 +1,21 @@
-import os
-import tempfile
-import warnings
 from pathlib import Path
 
 import streamlit as st
-from pydub import AudioSegment
-import openai
+
+from utils import (
+    AUDIO_MIME_TYPES,
+    bytes_for_download,
+    content_digest,
+    discard_job,
+    get_job_result,
+    get_session_tmp_dir,
+    job_done,
+    load_config,
+    segments_to_srt,
+    segments_to_text,
+    submit_extraction_job,
+    submit_transcription_job,
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 0) Konfiguracja kluczy i ffmpeg
@@ -19,72 +29,80 @@ if "audio_path" not in st.session_state:
     st.session_state["audio_path"] = None
 if "resp_format" not in st.session_state:
     st.session_state["resp_format"] = "srt"
+if "segments" not in st.session_state:
+    st.session_state["segments"] = None
 
-# Klucz API z Streamlit Secrets, .env lub środowiska
-OPENAI_API_KEY = None
-try:
-    if "OPENAI_API_KEY" in st.secrets:
-        OPENAI_API_KEY = st.secrets["OPENAI_API_KEY"]
-except Exception:
-    pass
+# Sekrety, .env i ścieżki ffmpeg — odczytywane raz na proces
+cfg = load_config()
+TRANSCRIPTION_BACKEND = cfg["TRANSCRIPTION_BACKEND"]
 
-if not OPENAI_API_KEY:
-    from dotenv import load_dotenv
-    load_dotenv()
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-if not OPENAI_API_KEY:
+if TRANSCRIPTION_BACKEND == "openai" and not cfg["OPENAI_API_KEY"]:
     st.error("Brak OPENAI_API_KEY. Dodaj go w Streamlit Secrets lub w pliku .env")
     st.stop()
 
-openai.api_key = OPENAI_API_KEY
-
-# Opcjonalny katalog ffmpeg
-FFMPEG_DIR = None
-try:
-    FFMPEG_DIR = st.secrets.get("FFMPEG_DIR", None)
-except Exception:
-    pass
-
-if FFMPEG_DIR:
-    os.environ["PATH"] += os.pathsep + FFMPEG_DIR
-    os.environ["FFMPEG_BINARY"] = str(Path(FFMPEG_DIR) / ("ffmpeg.exe" if os.name == "nt" else "ffmpeg"))
-    os.environ["FFPROBE_BINARY"] = str(Path(FFMPEG_DIR) / ("ffprobe.exe" if os.name == "nt" else "ffprobe"))
-
-warnings.filterwarnings("ignore", message="Couldn't find ffmpeg")
-warnings.filterwarnings("ignore", message="Couldn't find ffprobe")
-
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Funkcje pomocnicze
+# Funkcje interfejsu
 # ──────────────────────────────────────────────────────────────────────────────
-def save_uploaded_file_to_temp(uploaded_file) -> Path:
-    """Zapisuje UploadedFile do pliku tymczasowego z odpowiednim rozszerzeniem."""
-    suffix = Path(uploaded_file.name).suffix or ".mp4"
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    tmp.write(uploaded_file.read())
-    tmp.flush()
-    tmp.close()
-    return Path(tmp.name)
+def start_job(key: str, job_id: str) -> None:
+    """Zapisuje zadanie w tle pod session_state[key], porzucając poprzednie zadanie tej sesji."""
+    discard_job(st.session_state.get(key))
+    st.session_state[key] = job_id
 
 
-def extract_audio_to_mp3(video_path: Path) -> Path:
-    """Wyodrębnia audio z wideo do MP3 przy użyciu pydub (ffmpeg)."""
-    audio_seg = AudioSegment.from_file(str(video_path))
-    out_path = Path(tempfile.mkstemp(suffix=".mp3")[1])
-    audio_seg.export(str(out_path), format="mp3")
-    return out_path
+@st.fragment(run_every=1)
+def job_progress(key: str, message: str):
+    """Co 1 s odświeża tylko ten komunikat; gdy zadanie się skończy — całą aplikację."""
+    if job_done(st.session_state.get(key)):
+        st.rerun()
+    st.info(message)
+
+
+def collect_job(key: str, message: str):
+    """Zwraca wynik zakończonego zadania z session_state[key]; dopóki trwa, pokazuje postęp."""
+    job_id = st.session_state.get(key)
+    if not job_id:
+        return None
+    if not job_done(job_id):
+        job_progress(key, message)
+        return None
+    st.session_state[key] = None
+    return get_job_result(job_id)
+
+
+@st.fragment
+def transcription_panel(audio_path: Path):
+    """Krok 3: transkrypcja, podgląd i pobieranie — interakcje odświeżają tylko ten fragment."""
+    transcribe_pending = bool(st.session_state.get("transcribe_job"))
+    if st.button("🧠 Transkrybuj audio", type="primary", disabled=transcribe_pending):
+        st.session_state["segments"] = None
+        start_job(
+            "transcribe_job",
+            submit_transcription_job(audio_path, TRANSCRIPTION_BACKEND),
+        )
+        # Postęp pokazuje job_progress poza tym fragmentem
+        st.rerun()
 
+    if st.session_state["segments"] is not None:
+        st.success("Transkrypcja zakończona ✔️")
 
-def transcribe_audio(audio_path: Path) -> str:
-    """Transkrybuje audio z użyciem modelu Whisper-1."""
-    with open(audio_path, "rb") as f:
-        transcription = openai.Audio.transcribe("whisper-1", f)
-    return transcription["text"] if isinstance(transcription, dict) else str(transcription)
+        # Oba formaty powstają lokalnie z tych samych segmentów — bez ponownego wywołania API
+        formats = ["srt", "text"]
+        st.session_state["resp_format"] = st.selectbox(
+            "Format napisów:", formats, index=formats.index(st.session_state["resp_format"])
+        )
+        is_srt = st.session_state["resp_format"] == "srt"
+        captions = (segments_to_srt if is_srt else segments_to_text)(st.session_state["segments"])
+        edited = st.text_area("Podgląd napisów (możesz poprawić przed pobraniem):", captions, height=300)
 
+        st.download_button(
+            "⬇️ Pobierz napisy",
+            bytes_for_download(edited),
+            file_name="captions.srt" if is_srt else "captions.txt",
+            mime="text/plain",
+        )
 
-def bytes_for_download(text: str) -> bytes:
-    return text.encode("utf-8")
+        st.info("✅ Napisy zostały wygenerowane. Możesz wrócić i przetworzyć kolejne wideo.")
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -103,7 +121,11 @@ uploaded = st.file_uploader(
 
 if uploaded:
     st.video(uploaded)
-    video_tmp = save_uploaded_file_to_temp(uploaded)
+
+    # Skrót liczony raz na przesłany plik — identyczne pliki trafiają w ten sam cache
+    if st.session_state.get("upload_id") != uploaded.file_id:
+        st.session_state["upload_id"] = uploaded.file_id
+        st.session_state["upload_digest"] = content_digest(uploaded.getvalue())
 
     # Po wczytaniu pliku — przejdź do kroku 2
     if st.session_state["step"] == "upload":
@@ -116,52 +138,66 @@ if st.session_state["step"] == "extract_audio" and uploaded:
     st.divider()
     st.subheader("2️⃣ Wyodrębnij audio z wideo")
 
-    col1, col2 = st.columns(2)
-    with col1:
-        do_extract = st.button("🔊 Wyodrębnij audio (MP3)", type="primary")
-    with col2:
-        st.session_state["resp_format"] = st.selectbox(
-            "Format napisów:", ["srt", "text"], index=0
+    extract_pending = bool(st.session_state.get("extract_job"))
+    if st.button("🔊 Wyodrębnij audio", type="primary", disabled=extract_pending):
+        # ffmpeg działa w tle — skrypt tylko sprawdza stan zadania
+        start_job(
+            "extract_job",
+            submit_extraction_job(
+                st.session_state["upload_digest"],
+                uploaded.getvalue(),
+                Path(uploaded.name).suffix or ".mp4",
+            ),
         )
 
-    if do_extract:
-        try:
-            audio_mp3_path = extract_audio_to_mp3(video_tmp)
-            st.session_state["audio_path"] = str(audio_mp3_path)
-            st.audio(str(audio_mp3_path), format="audio/mp3")
+    try:
+        extracted = collect_job("extract_job", "Wyodrębnianie audio w toku…")
+        if extracted:
+            audio_bytes, audio_suffix = extracted
+            if audio_bytes is None:
+                # Whisper przyjmuje przesłany plik wprost — ekstrakcja pominięta
+                audio_bytes = uploaded.getvalue()
+            # Plik do odtwarzania i kroku 3 — w katalogu sesji, jeden na zawartość
+            digest = st.session_state["upload_digest"]
+            tmp_dir = get_session_tmp_dir(st.session_state)
+            audio_path = tmp_dir / f"audio-{digest}{audio_suffix}"
+            if not audio_path.exists():
+                audio_path.write_bytes(audio_bytes)
+            st.session_state["audio_path"] = str(audio_path)
+            st.audio(str(audio_path), format=AUDIO_MIME_TYPES[audio_suffix])
             st.success("Audio wyodrębnione ✔️")
 
             st.session_state["step"] = "transcribe"
             st.rerun()
 
-        except Exception as e:
-            st.error(f"Wystąpił błąd: {e}")
+    except Exception as e:
+        st.error(f"Wystąpił błąd: {e}")
 
 # ────────────────────────────────
 # KROK 3 – Transkrybuj audio
 # ────────────────────────────────
 elif st.session_state["step"] == "transcribe" and st.session_state["audio_path"]:
     st.divider()
-    st.subheader("3️⃣ Generuj napisy (Whisper-1)")
+    st.subheader(
+        "3️⃣ Generuj napisy "
+        + ("(faster-whisper, lokalnie)" if TRANSCRIPTION_BACKEND == "local" else "(Whisper-1)")
+    )
 
-    if st.button("🧠 Transkrybuj audio", type="primary"):
-        with st.spinner("Transkrypcja w toku…"):
-            captions = transcribe_audio(Path(st.session_state["audio_path"]))
-        st.success("Transkrypcja zakończona ✔️")
+    try:
+        segments = collect_job("transcribe_job", "Transkrypcja w toku…")
+        if segments is not None:
+            st.session_state["segments"] = segments
+    except Exception as e:
+        st.error(f"Wystąpił błąd: {e}")
 
-        st.download_button(
-            "⬇️ Pobierz napisy",
-            bytes_for_download(captions),
-            file_name="captions.srt"
-            if st.session_state["resp_format"] == "srt"
-            else "captions.txt",
-            mime="text/plain",
-        )
-
-        st.info("✅ Napisy zostały wygenerowane. Możesz wrócić i przetworzyć kolejne wideo.")
+    transcription_panel(Path(st.session_state["audio_path"]))
 
     if st.button("⬅️ Powrót do kroku 2 (Wyodrębnij audio)"):
         st.session_state["step"] = "extract_audio"
+        st.session_state["segments"] = None
+        # Porzucone zadanie nie może później zwrócić napisów dla innego audio
+        discard_job(st.session_state.get("transcribe_job"))
+        st.session_state["transcribe_job"] = None
         st.rerun()
 
 # ────────────────────────────────
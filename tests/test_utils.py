@@ -0,0 +1,394 @@
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+import utils
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Ekstrakcja audio
+# ──────────────────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize(
+    "output, codec, copy",
+    [
+        ("aac,64000\n", ("aac", 64000), True),
+        # Powyżej COPY_MAX_BIT_RATE taniej jest przekodować do Opus 24k
+        ("aac,128000\n", ("aac", 128000), False),
+        # Opus bez podanej przepływności — i tak jest formatem docelowym
+        ("opus,\n", ("opus", None), True),
+        ("mp3,N/A\n", ("mp3", None), False),
+        ("ac3,448000\n", ("ac3", 448000), False),
+        # Brak ścieżki audio
+        ("", None, False),
+    ],
+)
+def test_probe_audio_codec_and_copy_rule(output, codec, copy):
+    with mock.patch.object(utils, "find_ffprobe", return_value="ffprobe"), \
+            mock.patch.object(utils.subprocess, "check_output", return_value=output) as check_output:
+        assert utils.probe_audio_codec(Path("film.mov")) == codec
+    assert check_output.call_args.args[0][3:5] == ["-select_streams", "a:0"]
+    assert utils.can_copy_audio(codec) is copy
+
+
+def fake_ffmpeg_output(cmd, **kwargs):
+    Path(cmd[-1]).write_bytes(b"audio")
+    return mock.Mock()
+
+
+def extract(suffix, probe_output):
+    utils.extract_audio_for_whisper.clear()
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils, "find_ffprobe", return_value="ffprobe"), \
+            mock.patch.object(utils.subprocess, "check_output", return_value=probe_output), \
+            mock.patch.object(utils.subprocess, "run", side_effect=fake_ffmpeg_output) as run:
+        result = utils.extract_audio_for_whisper(
+            f"digest{suffix}{probe_output}", b"video", suffix, utils.CACHE_VERSION
+        )
+    return result, run
+
+
+@pytest.mark.parametrize(
+    "probe_output, out_suffix, codec_args",
+    [
+        ("aac,64000\n", ".m4a", ["-c:a", "copy"]),
+        ("opus,\n", ".ogg", ["-c:a", "copy"]),
+        ("aac,128000\n", ".ogg", ["-c:a", "libopus"]),
+        ("", ".ogg", ["-c:a", "libopus"]),
+    ],
+)
+def test_extract_audio_copies_or_reencodes(probe_output, out_suffix, codec_args):
+    (audio_bytes, suffix), run = extract(".mov", probe_output)
+    cmd = run.call_args.args[0]
+    assert (audio_bytes, suffix) == (b"audio", out_suffix)
+    assert cmd[cmd.index("-c:a"):cmd.index("-c:a") + 2] == codec_args
+    assert cmd[cmd.index("-map") + 1] == "0:a:0"
+
+
+@pytest.mark.parametrize(
+    "suffix, probe_output, passthrough",
+    [
+        (".mp4", "aac,64000\n", True),
+        (".webm", "opus,\n", True),
+        (".MP4", "aac,64000\n", True),
+        # Kontener spoza WHISPER_CONTAINERS — ścieżka jest kopiowana do .m4a
+        (".mov", "aac,64000\n", False),
+        # Ścieżki nie da się skopiować — przekodowanie mimo zgodnego kontenera
+        (".mp4", "aac,128000\n", False),
+    ],
+)
+def test_extract_audio_passthrough(suffix, probe_output, passthrough):
+    (audio_bytes, out_suffix), run = extract(suffix, probe_output)
+    if passthrough:
+        run.assert_not_called()
+        assert (audio_bytes, out_suffix) == (None, suffix.lower())
+    else:
+        assert audio_bytes == b"audio"
+    # app.py dobiera typ MIME odtwarzacza po rozszerzeniu
+    assert out_suffix in utils.AUDIO_MIME_TYPES
+
+
+def test_extract_audio_cache_is_salted_with_cache_version():
+    utils.extract_audio_for_whisper.clear()
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils, "find_ffprobe", return_value="ffprobe"), \
+            mock.patch.object(utils.subprocess, "check_output", return_value="aac,128000\n"), \
+            mock.patch.object(utils.subprocess, "run", side_effect=fake_ffmpeg_output) as run:
+        for version in (1, 1, 2):
+            utils.extract_audio_for_whisper("digest", b"video", ".mov", version)
+    # Ta sama wersja — wynik z cache; nowa wersja — ponowna ekstrakcja
+    assert run.call_count == 2
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Wykrywanie ciszy i cięcie na fragmenty
+# ──────────────────────────────────────────────────────────────────────────────
+def ffmpeg_log(*lines, duration="00:01:00.00"):
+    header = [f"  Duration: {duration}, start: 0.000000, bitrate: 64 kb/s"] if duration else []
+    return "\n".join(header + [f"[silencedetect @ 0x1] {line}" for line in lines])
+
+
+@pytest.mark.parametrize(
+    "stderr, expected",
+    [
+        (ffmpeg_log("silence_start: 1.5", "silence_end: 3 | silence_duration: 1.5"), ([(1.5, 3.0)], 60.0)),
+        # Ujemny początek (opóźnienie startu strumienia) jest przycinany do zera
+        (ffmpeg_log("silence_start: -0.0213", "silence_end: 0.75 | silence_duration: 0.77"), ([(0.0, 0.75)], 60.0)),
+        (ffmpeg_log("silence_start: 1.5e-05", "silence_end: 2.5 | silence_duration: 2.5"), ([(1.5e-05, 2.5)], 60.0)),
+        # Cisza do końca nagrania kończy się na jego długości
+        (ffmpeg_log("silence_start: 58.25"), ([(58.25, 60.0)], 60.0)),
+        # Koniec bez początku nie przesuwa kolejnych par
+        (ffmpeg_log("silence_end: 1 | silence_duration: 1", "silence_start: 5", "silence_end: 6"), ([(5.0, 6.0)], 60.0)),
+        (ffmpeg_log("silence_start: 5", duration=None), ([], None)),
+    ],
+)
+def test_detect_silences(stderr, expected):
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils.subprocess, "run", return_value=mock.Mock(stderr=stderr)):
+        assert utils.detect_silences(Path("a.ogg")) == expected
+
+
+def fake_segment_muxer(duration):
+    """Udaje muxer segment: zapisuje listę CSV fragmentów dla podanych -segment_times."""
+    def run(cmd, **kwargs):
+        if "-segment_times" not in cmd:
+            return mock.Mock()
+        cuts = [float(c) for c in cmd[cmd.index("-segment_times") + 1].split(",")]
+        bounds = [0.0, *cuts, duration]
+        rows = [f"chunk{i:04d}.ogg,{start:.6f},{end:.6f}" for i, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+        Path(cmd[cmd.index("-segment_list") + 1]).write_text("\n".join(rows) + "\n")
+        return mock.Mock()
+    return run
+
+
+def check_split(tmp_path, silences, duration, segment_times, starts):
+    audio_path = tmp_path / "audio.ogg"
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils, "detect_silences", return_value=(silences, duration)), \
+            mock.patch.object(utils.subprocess, "run", side_effect=fake_segment_muxer(duration)) as run:
+        chunks = utils.split_audio_at_silence(audio_path, tmp_path)
+
+    if segment_times is None:
+        run.assert_not_called()
+        assert chunks == [(audio_path, 0.0)]
+    else:
+        cmd = run.call_args.args[0]
+        assert cmd[cmd.index("-segment_times") + 1] == segment_times
+        assert [start for _, start in chunks] == pytest.approx(starts)
+
+
+@pytest.mark.parametrize(
+    "silences, duration, segment_times, starts",
+    [
+        # Krótkie nagranie — plik bez cięcia
+        ([], 60.0, None, [0.0]),
+        # Krótka cisza tnie (w połowie) dopiero po target_sec od poprzedniego cięcia
+        ([(50.0, 50.5), (60.0, 60.4)], 100.0, "50.250", [0.0, 50.25]),
+        ([(20.0, 20.4), (50.0, 50.4), (99.0, 99.4)], 120.0, "50.200,99.200", [0.0, 50.2, 99.2]),
+    ],
+)
+def test_split_audio_at_short_silences(tmp_path, silences, duration, segment_times, starts):
+    check_split(tmp_path, silences, duration, segment_times, starts)
+
+
+@pytest.mark.parametrize(
+    "silences, duration, segment_times, starts",
+    [
+        # Długa cisza trafia do osobnego, pomijanego fragmentu (z marginesem SILENCE_PAD_SEC)
+        ([(10.0, 15.0)], 30.0, "10.200,14.800", [0.0, 14.8]),
+        ([(10.0, 15.0), (20.0, 25.0)], 40.0, "10.200,14.800,20.200,24.800", [0.0, 14.8, 24.8]),
+        # Cisza na początku nagrania — bez fragmentu przed nią
+        ([(0.0, 3.0)], 20.0, "2.800", [2.8]),
+        # Za krótki ostatni fragment (< MIN_CHUNK_SEC) jest pomijany
+        ([(17.0, 19.7)], 19.9, "17.200,19.500", [0.0]),
+    ],
+)
+def test_split_audio_skips_long_silences(tmp_path, silences, duration, segment_times, starts):
+    check_split(tmp_path, silences, duration, segment_times, starts)
+
+
+@pytest.mark.parametrize(
+    "silences, duration, segment_times, starts",
+    [
+        # Ciągła mowa dłuższa niż MAX_CHUNK_SEC — cięcia na sztywno, po równo
+        ([], 200.0, "66.667,133.333", [0.0, 66.667, 133.333]),
+        ([], 2 * utils.MAX_CHUNK_SEC, f"{utils.MAX_CHUNK_SEC:.3f}", [0.0, utils.MAX_CHUNK_SEC]),
+        # Po długiej ciszy mowa > MAX_CHUNK_SEC przed kolejną krótką ciszą też jest dzielona
+        ([(10.0, 13.0), (200.0, 200.4)], 210.0, "10.200,12.800,75.267,137.733,200.200",
+         [0.0, 12.8, 75.267, 137.733, 200.2]),
+    ],
+)
+def test_split_audio_hard_cuts(tmp_path, silences, duration, segment_times, starts):
+    check_split(tmp_path, silences, duration, segment_times, starts)
+
+
+def test_detect_silences_skips_video_stream():
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils.subprocess, "run", return_value=mock.Mock(stderr=ffmpeg_log())) as run:
+        utils.detect_silences(Path("film.mp4"))
+    cmd = run.call_args.args[0]
+    # Tylko sprawdzana ścieżka audio, bez dekodowania obrazu
+    assert "-vn" in cmd
+    assert cmd[cmd.index("-map") + 1] == "0:a:0"
+
+
+def test_split_audio_at_silence_video_without_cuts(tmp_path):
+    video_path = tmp_path / "film.webm"
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils, "detect_silences", return_value=([], 30.0)), \
+            mock.patch.object(utils.subprocess, "run") as run:
+        chunks = utils.split_audio_at_silence(video_path, tmp_path)
+
+    # Do API trafia sama ścieżka audio, skopiowana bez rekompresji
+    assert chunks == [(tmp_path / "audio-only.webm", 0.0)]
+    assert run.call_args.args[0][-6:] == ["-map", "0:a:0", "-vn", "-c:a", "copy", str(tmp_path / "audio-only.webm")]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Napisy SRT
+# ──────────────────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize(
+    "seconds, expected",
+    [
+        (0.0, "00:00:00,000"),
+        (1.234, "00:00:01,234"),
+        (3661.5, "01:01:01,500"),
+        # Zaokrąglenie milisekund przenosi się na minuty
+        (59.9996, "00:01:00,000"),
+    ],
+)
+def test_format_srt_time(seconds, expected):
+    assert utils.format_srt_time(seconds) == expected
+
+
+def test_segments_to_srt():
+    srt = utils.segments_to_srt([seg(0.0, 1.5, " Dzień dobry. "), seg(61.0, 62.25, "Do widzenia.")])
+    assert srt == (
+        "1\n00:00:00,000 --> 00:00:01,500\nDzień dobry.\n\n"
+        "2\n00:01:01,000 --> 00:01:02,250\nDo widzenia.\n"
+    )
+
+
+def test_segments_to_text():
+    assert utils.segments_to_text([seg(0.0, 1.5, " Dzień dobry. "), seg(2.0, 3.0, "Do widzenia.")]) == (
+        "Dzień dobry.\nDo widzenia."
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Sklejanie krótkich nagrań (transcribe_many)
+# ──────────────────────────────────────────────────────────────────────────────
+def seg(start, end, text="x"):
+    return {"start": start, "end": end, "text": text}
+
+
+@pytest.mark.parametrize(
+    "segments, offsets, expected",
+    [
+        # Segment trafia do nagrania, w którego przedziale leży jego środek
+        ([seg(0.5, 2.0), seg(11.5, 13.0)], [0.0, 11.0], [[seg(0.5, 2.0)], [seg(0.5, 2.0)]]),
+        # Środek w przerwie po nagraniu 0 — nadal nagranie 0
+        ([seg(9.0, 11.4)], [0.0, 11.0], [[seg(9.0, 11.4)], []]),
+        # Segment zaczynający się tuż przed offsetem nie dostaje ujemnego początku
+        ([seg(10.8, 13.0)], [0.0, 11.0], [[], [seg(0.0, 2.0)]]),
+        ([], [0.0, 5.0, 9.0], [[], [], []]),
+    ],
+)
+def test_split_segments_by_clip(segments, offsets, expected):
+    result = utils.split_segments_by_clip(segments, offsets)
+    assert [[pytest.approx(s) for s in clip] for clip in expected] == result
+
+
+def test_transcribe_many_forces_exact_clip_lengths():
+    clips = [Path("a.ogg"), Path("b.m4a")]
+    with mock.patch.object(utils, "find_ffmpeg", return_value="ffmpeg"), \
+            mock.patch.object(utils, "probe_duration", side_effect=[4.0, 2.5]), \
+            mock.patch.object(utils, "get_openai_client"), \
+            mock.patch.object(utils, "transcribe_file", return_value=[seg(1.0, 2.0), seg(5.5, 6.5)]), \
+            mock.patch.object(utils.subprocess, "run") as run:
+        result = utils.transcribe_many(clips)
+
+    graph = run.call_args.args[0][run.call_args.args[0].index("-filter_complex") + 1]
+    assert "atrim=duration=4.0,apad=whole_dur=5.0[a0]" in graph
+    assert "atrim=duration=2.5,apad=whole_dur=3.5[a1]" in graph
+    assert result == [[seg(1.0, 2.0)], [seg(0.5, 1.5)]]
+
+
+def test_transcribe_many_without_ffmpeg():
+    with mock.patch.object(utils, "find_ffmpeg", return_value=None):
+        with pytest.raises(RuntimeError, match="ffmpeg"):
+            utils.transcribe_many([Path("a.ogg")])
+
+
+@pytest.mark.parametrize(
+    "output, expected",
+    [
+        ("12.480000\n12.500000\n", 12.48),
+        # Strumień bez zapisanej długości (np. WebM) — długość kontenera
+        ("N/A\n7.250000\n", 7.25),
+    ],
+)
+def test_probe_duration_prefers_audio_stream(output, expected):
+    with mock.patch.object(utils, "find_ffprobe", return_value="ffprobe"), \
+            mock.patch.object(utils.subprocess, "check_output", return_value=output):
+        assert utils.probe_duration(Path("a.webm")) == expected
+
+
+def test_probe_duration_without_ffprobe():
+    with mock.patch.object(utils, "find_ffprobe", return_value=None):
+        with pytest.raises(RuntimeError, match="ffprobe"):
+            utils.probe_duration(Path("a.ogg"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Zadania w tle (JobRunner)
+# ──────────────────────────────────────────────────────────────────────────────
+def wait_done(runner, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not runner.done(job_id):
+        assert time.monotonic() < deadline, "zadanie nie zakończyło się na czas"
+        time.sleep(0.01)
+
+
+def test_job_result_before_and_after_completion():
+    runner = utils.JobRunner(max_workers=1)
+    gate = threading.Event()
+    job_id = runner.submit(lambda: gate.wait(5) and "wynik")
+
+    assert not runner.done(job_id)
+    assert runner.result(job_id) is None
+    gate.set()
+    wait_done(runner, job_id)
+    assert runner.result(job_id) == "wynik"
+    # Wynik odbiera się raz
+    with pytest.raises(LookupError):
+        runner.result(job_id)
+
+
+def test_job_error_is_raised_from_result():
+    runner = utils.JobRunner(max_workers=1)
+    job_id = runner.submit(lambda: 1 / 0)
+    wait_done(runner, job_id)
+    with pytest.raises(ZeroDivisionError):
+        runner.result(job_id)
+
+
+@pytest.mark.parametrize(
+    "elapsed, expired", [(utils.JOB_RESULT_TTL_SEC - 1, False), (utils.JOB_RESULT_TTL_SEC + 1, True)]
+)
+def test_finished_job_expires_after_ttl(elapsed, expired):
+    clock = mock.Mock()
+    clock.monotonic.return_value = 1000.0
+    with mock.patch.object(utils, "time", clock):
+        runner = utils.JobRunner(max_workers=1)
+        job_id = runner.submit(lambda: "wynik")
+        wait_done(runner, job_id)
+        clock.monotonic.return_value = 1000.0 + elapsed
+        if expired:
+            with pytest.raises(LookupError):
+                runner.result(job_id)
+        else:
+            assert runner.result(job_id) == "wynik"
+
+
+def test_discard_pending_job():
+    runner = utils.JobRunner(max_workers=1)
+    gate = threading.Event()
+    running = runner.submit(gate.wait, 5)
+    queued = runner.submit(lambda: "wynik")
+
+    runner.discard(queued)
+    runner.discard(running)
+    gate.set()
+    # Zakończenie porzuconego zadania nie przywraca jego wyniku
+    time.sleep(0.05)
+    for job_id in (running, queued):
+        assert runner.done(job_id)
+        with pytest.raises(LookupError):
+            runner.result(job_id)
+
+
+def test_done_for_unknown_job():
+    assert utils.JobRunner(max_workers=1).done("brak")
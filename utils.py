@@ -0,0 +1,615 @@
+import atexit
+import bisect
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import streamlit as st
+import openai
+import requests
+import xxhash
+
+# Długie nagrania dzielimy na fragmenty ~45 s (cięte w ciszy) i transkrybujemy równolegle
+CHUNK_SECONDS = 45
+MAX_WORKERS = 8
+# Limity czasu zapytań do API (połączenie, odczyt) w sekundach
+CONNECT_TIMEOUT_SEC = 10
+READ_TIMEOUT_SEC = 600
+# Zdarzenia silencedetect; znaczniki bywają ujemne lub w notacji wykładniczej
+SILENCE_EVENT_RE = re.compile(r"silence_(start|end): (-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)")
+# Ciszy dłuższej niż SKIP_SILENCE_SEC nie wysyłamy do API (z marginesem SILENCE_PAD_SEC)
+SKIP_SILENCE_SEC = 2.0
+SILENCE_PAD_SEC = 0.2
+MIN_CHUNK_SEC = 0.5
+MAX_CHUNK_SEC = 2 * CHUNK_SECONDS
+# Przerwa ciszy między krótkimi nagraniami sklejanymi w jedno zapytanie (transcribe_many)
+CLIP_GAP_SEC = 1.0
+
+# Kodeki akceptowane przez Whisper, które kopiujemy bez rekompresji (kodek → rozszerzenie)
+COPY_SUFFIXES = {"opus": ".ogg", "aac": ".m4a", "mp3": ".mp3"}
+# Powyżej tej przepływności taniej jest przekodować do Opus 24k niż wysłać oryginał
+COPY_MAX_BIT_RATE = 96_000
+# Kontenery wideo, które Whisper przyjmuje wprost — przy zgodnej ścieżce audio bez ekstrakcji
+WHISPER_CONTAINERS = {".mp4", ".webm"}
+AUDIO_MIME_TYPES = {
+    ".ogg": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".mp3": "audio/mpeg",
+    ".mp4": "audio/mp4",
+    ".webm": "audio/webm",
+}
+
+# Lokalny backend (faster-whisper, CTranslate2 int8 na CPU)
+LOCAL_MODEL_SIZE = "small"
+LOCAL_BATCH_SIZE = 16
+
+# Zwiększ, aby unieważnić zapisane na dysku wyniki ekstrakcji i transkrypcje
+# (np. po zmianie modelu, reguł kopiowania ścieżki audio lub parametrów ffmpeg)
+CACHE_VERSION = 1
+
+# Liczba wątków w tle wspólnych dla wszystkich sesji (ffmpeg, wywołania API)
+JOB_WORKERS = 4
+# Po tym czasie (s) nieodebrany wynik zadania jest usuwany z pamięci
+JOB_RESULT_TTL_SEC = 600
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Funkcje pomocnicze
+# ──────────────────────────────────────────────────────────────────────────────
+@st.cache_resource
+def load_config() -> dict:
+    """Odczytuje sekrety/.env i konfiguruje ffmpeg raz na proces, a nie przy każdym rerunie."""
+    secrets = {}
+    try:
+        for name in ("OPENAI_API_KEY", "FFMPEG_DIR", "TRANSCRIPTION_BACKEND"):
+            if name in st.secrets:
+                secrets[name] = st.secrets[name]
+    except Exception:
+        pass
+
+    # Klucz API z Streamlit Secrets, .env lub środowiska
+    openai_api_key = secrets.get("OPENAI_API_KEY")
+    if not openai_api_key:
+        from dotenv import load_dotenv
+        load_dotenv()
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    # Klient OpenAI (get_openai_client) odczytuje klucz ze środowiska
+    if openai_api_key:
+        os.environ["OPENAI_API_KEY"] = openai_api_key
+
+    # Opcjonalny katalog ffmpeg
+    ffmpeg_dir = secrets.get("FFMPEG_DIR")
+    if ffmpeg_dir:
+        os.environ["PATH"] += os.pathsep + ffmpeg_dir
+        os.environ["FFMPEG_BINARY"] = str(Path(ffmpeg_dir) / ("ffmpeg.exe" if os.name == "nt" else "ffmpeg"))
+        os.environ["FFPROBE_BINARY"] = str(Path(ffmpeg_dir) / ("ffprobe.exe" if os.name == "nt" else "ffprobe"))
+
+    warnings.filterwarnings("ignore", message="Couldn't find ffmpeg")
+    warnings.filterwarnings("ignore", message="Couldn't find ffprobe")
+
+    return {
+        "OPENAI_API_KEY": openai_api_key,
+        "FFMPEG_DIR": ffmpeg_dir,
+        # "openai" (API Whisper-1, domyślnie) lub "local" (faster-whisper)
+        "TRANSCRIPTION_BACKEND": secrets.get("TRANSCRIPTION_BACKEND", "openai"),
+    }
+
+
+def make_temp_path(suffix: str) -> Path:
+    """Tworzy pusty plik tymczasowy i zamyka jego deskryptor (mkstemp zostawia go otwartego)."""
+    fd, name = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    return Path(name)
+
+
+def save_bytes_to_temp(data: bytes, suffix: str) -> Path:
+    """Zapisuje bajty do pliku tymczasowego z podanym rozszerzeniem."""
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    tmp.write(data)
+    tmp.flush()
+    tmp.close()
+    return Path(tmp.name)
+
+
+def get_session_tmp_dir(session_state) -> Path:
+    """Zwraca katalog tymczasowy sesji; jest usuwany w całości przy zamknięciu procesu."""
+    if "tmp_dir" not in session_state:
+        tmp_dir = tempfile.mkdtemp(prefix="napisy-")
+        atexit.register(shutil.rmtree, tmp_dir, ignore_errors=True)
+        session_state["tmp_dir"] = tmp_dir
+    return Path(session_state["tmp_dir"])
+
+
+def content_digest(data) -> str:
+    """Zwraca skrót xxh3-128 zawartości pliku — stabilny klucz cache między sesjami."""
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+def file_digest(path: Path, block_size: int = 1 << 20) -> str:
+    """Jak content_digest, ale czyta plik porcjami — bez wczytywania całości do pamięci."""
+    digest = xxhash.xxh3_128()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_ffmpeg() -> str | None:
+    """Zwraca ścieżkę do ffmpeg (FFMPEG_BINARY lub PATH) albo None, gdy brak."""
+    ffmpeg_binary = os.environ.get("FFMPEG_BINARY")
+    if ffmpeg_binary and Path(ffmpeg_binary).is_file():
+        return ffmpeg_binary
+    return shutil.which("ffmpeg")
+
+
+def find_ffprobe() -> str | None:
+    """Zwraca ścieżkę do ffprobe (FFPROBE_BINARY lub PATH) albo None, gdy brak."""
+    ffprobe_binary = os.environ.get("FFPROBE_BINARY")
+    if ffprobe_binary and Path(ffprobe_binary).is_file():
+        return ffprobe_binary
+    return shutil.which("ffprobe")
+
+
+def probe_audio_codec(path: Path) -> tuple[str, int | None] | None:
+    """Zwraca (kodek, przepływność) pierwszej ścieżki audio albo None, gdy nie da się ustalić."""
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return None
+    try:
+        output = subprocess.check_output(
+            [ffprobe, "-v", "error", "-select_streams", "a:0",
+             "-show_entries", "stream=codec_name,bit_rate", "-of", "csv=p=0", str(path)],
+            text=True,
+        )
+    except subprocess.CalledProcessError:
+        return None
+    fields = output.strip().split(",")
+    if not fields[0]:
+        return None
+    bit_rate = fields[1] if len(fields) > 1 else ""
+    return fields[0], int(bit_rate) if bit_rate.isdigit() else None
+
+
+def can_copy_audio(codec: tuple[str, int | None] | None) -> bool:
+    """Czy ścieżkę audio można przekazać do Whisper bez rekompresji."""
+    if not codec or codec[0] not in COPY_SUFFIXES:
+        return False
+    name, bit_rate = codec
+    # Opus nie zawsze podaje przepływność, a i tak jest formatem docelowym
+    return name == "opus" or (bit_rate is not None and bit_rate <= COPY_MAX_BIT_RATE)
+
+
+def probe_duration(path: Path) -> float:
+    """Zwraca długość pierwszej ścieżki audio w sekundach (ffprobe), a gdy jej brak — kontenera."""
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        raise RuntimeError("Nie znaleziono ffprobe — ustaw FFMPEG_DIR lub dodaj ffmpeg do PATH.")
+    # Długość kontenera bywa dłuższa niż audio (np. wideo), a apad dopełnia właśnie ścieżkę audio
+    output = subprocess.check_output(
+        [ffprobe, "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=duration:format=duration", "-of", "csv=p=0", str(path)],
+        text=True,
+    )
+    for value in output.split():
+        try:
+            return float(value.strip(","))
+        except ValueError:
+            continue  # "N/A" — strumień bez zapisanej długości
+    raise RuntimeError(f"Nie udało się odczytać długości nagrania: {path.name}")
+
+
+@st.cache_data(show_spinner=False, max_entries=8, persist="disk")
+def extract_audio_for_whisper(
+    digest: str, _video_bytes: bytes, suffix: str, cache_version: int
+) -> tuple[bytes | None, str]:
+    """Wyodrębnia audio dla Whisper (kopia zgodnej ścieżki lub Opus 16 kHz mono) → (bajty, rozszerzenie).
+
+    Zwraca (None, rozszerzenie), gdy przesłany plik można przekazać do transkrypcji bez zmian.
+    Klucz cache nie obejmuje funkcji pomocniczych ani stałych — stąd cache_version (CACHE_VERSION).
+    """
+    suffix = suffix.lower()
+    video_path = save_bytes_to_temp(_video_bytes, suffix)
+    out_path = None
+    try:
+        ffmpeg = find_ffmpeg()
+        codec = probe_audio_codec(video_path) if ffmpeg else None
+        if suffix in WHISPER_CONTAINERS and can_copy_audio(codec):
+            # Bez osobnego przebiegu ffmpeg; ścieżkę audio wydziela dopiero cięcie na fragmenty
+            return None, suffix
+        if can_copy_audio(codec):
+            out_path = make_temp_path(COPY_SUFFIXES[codec[0]])
+            # -map 0:a:0: kopiowana jest ta sama ścieżka, którą sprawdził probe_audio_codec
+            subprocess.run(
+                [ffmpeg, "-y", "-i", str(video_path), "-map", "0:a:0", "-vn",
+                 "-c:a", "copy", str(out_path)],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        elif ffmpeg:
+            out_path = make_temp_path(".ogg")
+            # Bez pośredniego dekodowania PCM do pamięci Pythona
+            subprocess.run(
+                [ffmpeg, "-y", "-i", str(video_path), "-map", "0:a:0", "-vn",
+                 "-ac", "1", "-ar", "16000",
+                 "-c:a", "libopus", "-b:a", "24k", "-application", "voip",
+                 str(out_path)],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            from pydub import AudioSegment
+
+            out_path = make_temp_path(".ogg")
+            audio_seg = AudioSegment.from_file(str(video_path))
+            audio_seg.set_channels(1).set_frame_rate(16000).export(
+                str(out_path), format="ogg", codec="libopus", bitrate="24k"
+            )
+        return out_path.read_bytes(), out_path.suffix
+    finally:
+        video_path.unlink(missing_ok=True)
+        if out_path:
+            out_path.unlink(missing_ok=True)
+
+
+class TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+    """Adapter HTTP z osobnym limitem czasu na nawiązanie połączenia.
+
+    SDK openai 0.28 przekazuje do requests tylko jeden limit (odczyt); tu dokładamy limit połączenia.
+    """
+
+    def send(self, request, timeout=None, **kwargs):
+        if not isinstance(timeout, tuple):
+            timeout = (CONNECT_TIMEOUT_SEC, timeout or READ_TIMEOUT_SEC)
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+@st.cache_resource
+def get_openai_client():
+    """Konfiguruje klienta OpenAI raz na proces — ze wspólną pulą połączeń HTTP (keep-alive)."""
+    session = requests.Session()
+    # max_retries jak w domyślnej sesji SDK (MAX_CONNECTION_RETRIES)
+    session.mount("https://", TimeoutHTTPAdapter(pool_maxsize=MAX_WORKERS, max_retries=2))
+    openai.api_key = os.environ["OPENAI_API_KEY"]
+    openai.requestssession = session
+    return openai
+
+
+def detect_silences(audio_path: Path) -> tuple[list[tuple[float, float]], float | None]:
+    """Zwraca przedziały ciszy (początek, koniec w s) z filtra silencedetect i długość nagrania."""
+    result = subprocess.run(
+        [find_ffmpeg(), "-hide_banner", "-nostats", "-i", str(audio_path), "-map", "0:a:0", "-vn",
+         "-af", "silencedetect=noise=-35dB:d=0.3", "-f", "null", "-"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    duration = re.search(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)", result.stderr)
+    if duration:
+        duration = int(duration[1]) * 3600 + int(duration[2]) * 60 + float(duration[3])
+
+    # Zdarzenia w kolejności wystąpienia — pominięty znacznik nie przesuwa kolejnych par
+    silences, start = [], None
+    for kind, value in SILENCE_EVENT_RE.findall(result.stderr):
+        if kind == "start":
+            start = max(float(value), 0.0)
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+    if start is not None and duration:
+        # Cisza trwająca do końca nagrania
+        silences.append((start, duration))
+    return silences, duration
+
+
+def split_audio_at_silence(
+    audio_path: Path, out_dir: Path, target_sec: int = CHUNK_SECONDS
+) -> list[tuple[Path, float]]:
+    """Dzieli audio w miejscach ciszy na fragmenty ≥ target_sec; zwraca (plik, początek w s).
+
+    Długie przerwy trafiają do osobnych fragmentów, które są pomijane — API nie dostaje ciszy,
+    a znaczniki czasu pozostałych fragmentów nadal odpowiadają oryginałowi.
+    """
+    if not find_ffmpeg():
+        return [(audio_path, 0.0)]
+
+    cuts, silent = [], set()
+
+    def cut_at(t: float) -> None:
+        # Odcinek mowy bez przerwy dłuższy niż MAX_CHUNK_SEC tniemy na sztywno, żeby żadne
+        # zapytanie (SDK buduje całe ciało multipart w pamięci) nie przekraczało tej długości
+        last = cuts[-1] if cuts else 0.0
+        parts = math.ceil((t - last) / MAX_CHUNK_SEC)
+        cuts.extend(last + (t - last) * k / parts for k in range(1, parts))
+        cuts.append(t)
+
+    silences, duration = detect_silences(audio_path)
+    for start, end in silences:
+        if end - start >= SKIP_SILENCE_SEC:
+            if start > SILENCE_PAD_SEC:
+                cut_at(start + SILENCE_PAD_SEC)
+            silent.add(len(cuts))
+            cuts.append(end - SILENCE_PAD_SEC)
+        elif (start + end) / 2 - (cuts[-1] if cuts else 0.0) >= target_sec:
+            cut_at((start + end) / 2)
+    if duration:
+        cut_at(duration)
+        cuts.pop()
+    if not cuts:
+        if audio_path.suffix not in WHISPER_CONTAINERS:
+            return [(audio_path, 0.0)]
+        # Oryginalny plik wideo — do API trafia sama ścieżka audio, bez rekompresji
+        audio_only = out_dir / f"audio-only{audio_path.suffix}"
+        subprocess.run(
+            [find_ffmpeg(), "-y", "-i", str(audio_path), "-map", "0:a:0", "-vn",
+             "-c:a", "copy", str(audio_only)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return [(audio_only, 0.0)]
+
+    # Cięcie bez rekompresji; rzeczywiste czasy startu fragmentów podaje lista CSV
+    list_path = out_dir / "chunks.csv"
+    subprocess.run(
+        [find_ffmpeg(), "-y", "-i", str(audio_path), "-map", "0:a:0", "-vn", "-c:a", "copy",
+         "-f", "segment", "-segment_times", ",".join(f"{c:.3f}" for c in cuts),
+         "-reset_timestamps", "1",
+         "-segment_list", str(list_path), "-segment_list_type", "csv",
+         str(out_dir / f"chunk%04d{audio_path.suffix}")],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    chunks = []
+    for index, line in enumerate(list_path.read_text().splitlines()):
+        name, start, end = line.rsplit(",", 2)
+        if index in silent or float(end) - float(start) < MIN_CHUNK_SEC:
+            continue
+        chunks.append((out_dir / name, float(start)))
+    return chunks
+
+
+def format_srt_time(seconds: float) -> str:
+    """Formatuje sekundy jako znacznik czasu SRT (HH:MM:SS,mmm)."""
+    millis = round(seconds * 1000)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02},{millis:03}"
+
+
+def transcribe_file(client, audio_path: Path, offset: float = 0.0) -> list[dict]:
+    """Wysyła jeden plik audio do Whisper-1; zwraca segmenty przesunięte o offset sekund."""
+    with open(audio_path, "rb") as f:
+        transcription = client.Audio.transcribe("whisper-1", f, response_format="verbose_json")
+    return [
+        {"start": seg["start"] + offset, "end": seg["end"] + offset, "text": seg["text"]}
+        for seg in transcription["segments"]
+    ]
+
+
+def segments_to_srt(segments: list[dict]) -> str:
+    """Buduje napisy SRT z listy segmentów {"start", "end", "text"}."""
+    blocks = []
+    for i, seg in enumerate(segments, start=1):
+        timing = f"{format_srt_time(seg['start'])} --> {format_srt_time(seg['end'])}"
+        blocks.append(f"{i}\n{timing}\n{seg['text'].strip()}")
+    return "\n\n".join(blocks) + "\n"
+
+
+def segments_to_text(segments: list[dict]) -> str:
+    """Buduje zwykły tekst (jedna linia na segment) z listy segmentów."""
+    return "\n".join(seg["text"].strip() for seg in segments)
+
+
+@st.cache_resource
+def get_model():
+    """Ładuje lokalny model faster-whisper raz na proces, opakowany w potok wsadowy."""
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+    return BatchedInferencePipeline(
+        model=WhisperModel(LOCAL_MODEL_SIZE, device="cpu", compute_type="int8")
+    )
+
+
+def transcribe_local(audio_path: Path) -> list[dict]:
+    """Transkrybuje audio lokalnie (faster-whisper) — bez wysyłania pliku do API."""
+    # VAD (Silero) odrzuca ciszę przed enkoderem; okna z mową są dekodowane wsadami
+    segments, _ = get_model().transcribe(
+        str(audio_path),
+        beam_size=1,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=500),
+        batch_size=LOCAL_BATCH_SIZE,
+    )
+    return [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+
+
+def transcribe_openai(audio_path: Path) -> list[dict]:
+    """Transkrybuje audio przez API Whisper-1, równolegle we fragmentach."""
+    client = get_openai_client()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chunks = split_audio_at_silence(audio_path, Path(tmp_dir))
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            parts = list(executor.map(lambda c: transcribe_file(client, *c), chunks))
+    return [seg for part in parts for seg in part]
+
+
+def split_segments_by_clip(segments: list[dict], offsets: list[float]) -> list[list[dict]]:
+    """Rozdziela segmenty sklejonego nagrania według początków nagrań (offsets); czasy liczone od nich."""
+    per_clip = [[] for _ in offsets]
+    for seg in segments:
+        index = max(bisect.bisect_right(offsets, (seg["start"] + seg["end"]) / 2) - 1, 0)
+        offset = offsets[index]
+        per_clip[index].append(
+            {"start": max(seg["start"] - offset, 0.0), "end": seg["end"] - offset, "text": seg["text"]}
+        )
+    return per_clip
+
+
+def transcribe_many(clips: list[Path]) -> list[list[dict]]:
+    """Transkrybuje wiele krótkich nagrań jednym zapytaniem; zwraca segmenty osobno dla każdego.
+
+    Nagrania są sklejane z przerwą CLIP_GAP_SEC ciszy, a segmenty wracają do nagrania,
+    w którego przedziale leży ich środek (czasy liczone od początku tego nagrania).
+    """
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("Nie znaleziono ffmpeg — ustaw FFMPEG_DIR lub dodaj ffmpeg do PATH.")
+    durations = [probe_duration(clip) for clip in clips]
+    offsets, position = [], 0.0
+    for duration in durations:
+        offsets.append(position)
+        position += duration + CLIP_GAP_SEC
+
+    inputs = [arg for clip in clips for arg in ("-i", str(clip))]
+    # atrim + apad=whole_dur wymuszają dokładną długość każdego kawałka, więc offsety się nie rozjeżdżają
+    pads = "".join(
+        f"[{i}:a]aresample=16000,aformat=channel_layouts=mono,"
+        f"atrim=duration={duration},apad=whole_dur={duration + CLIP_GAP_SEC}[a{i}];"
+        for i, duration in enumerate(durations)
+    )
+    concat = "".join(f"[a{i}]" for i in range(len(clips))) + f"concat=n={len(clips)}:v=0:a=1[out]"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        concat_path = Path(tmp_dir) / "concat.ogg"
+        subprocess.run(
+            [ffmpeg, "-y", *inputs, "-filter_complex", pads + concat, "-map", "[out]",
+             "-c:a", "libopus", "-b:a", "24k", "-application", "voip", str(concat_path)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        segments = transcribe_file(get_openai_client(), concat_path)
+    return split_segments_by_clip(segments, offsets)
+
+
+@st.cache_data(show_spinner=False, max_entries=200, persist="disk")
+def transcribe_audio(digest: str, _audio_path: Path, backend: str, cache_version: int) -> list[dict]:
+    """Transkrybuje audio wybranym backendem ("openai" lub "local") do listy segmentów z czasami.
+
+    SRT i tekst powstają z tych samych segmentów, więc zmiana formatu nie wymaga ponownej transkrypcji.
+    Kluczem cache jest skrót xxh3 pliku (digest), nie sam plik; cache_version (CACHE_VERSION)
+    unieważnia stare wpisy zapisane na dysku.
+    """
+    # Plik czytany wprost z katalogu sesji — rozszerzenie ścieżki mówi OpenAI, jaki to format
+    if backend == "local":
+        return transcribe_local(_audio_path)
+    return transcribe_openai(_audio_path)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def bytes_for_download(text: str) -> bytes:
+    return text.encode("utf-8")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Zadania w tle
+# ──────────────────────────────────────────────────────────────────────────────
+class JobRunner:
+    """Wykonuje zadania poza wątkiem skryptu Streamlit; wyniki odbiera się po job_id.
+
+    Wyniki nieodebrane przez JOB_RESULT_TTL_SEC (zamknięta karta, porzucone zadanie) są usuwane.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: dict[str, Future] = {}
+        self._finished_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args) -> str:
+        self._evict_expired()
+        job_id = uuid.uuid4().hex
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self._jobs[job_id] = future
+        future.add_done_callback(lambda _: self._mark_finished(job_id))
+        return job_id
+
+    def done(self, job_id: str) -> bool:
+        """Czy zadanie się zakończyło (albo już go nie ma)."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        return future is None or future.done()
+
+    def result(self, job_id: str):
+        """Zwraca wynik (None, gdy zadanie trwa) i zapomina zadanie; błąd zadania jest zgłaszany."""
+        self._evict_expired()
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if future is None:
+                raise LookupError("Wynik zadania wygasł — uruchom je ponownie.")
+            if not future.done():
+                return None
+            del self._jobs[job_id]
+            self._finished_at.pop(job_id, None)
+        return future.result()
+
+    def discard(self, job_id: str) -> None:
+        """Porzuca zadanie: anuluje je, jeśli jeszcze czeka, i nie przechowuje wyniku."""
+        with self._lock:
+            future = self._jobs.pop(job_id, None)
+            self._finished_at.pop(job_id, None)
+        if future:
+            future.cancel()
+
+    def _mark_finished(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._finished_at[job_id] = time.monotonic()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for job_id, finished_at in list(self._finished_at.items()):
+                if now - finished_at > JOB_RESULT_TTL_SEC:
+                    del self._finished_at[job_id]
+                    del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_worker() -> JobRunner:
+    """Jedna pula zadań w tle na proces."""
+    return JobRunner()
+
+
+def submit_job(fn, *args) -> str:
+    return get_worker().submit(fn, *args)
+
+
+def submit_extraction_job(digest: str, video_bytes: bytes, suffix: str) -> str:
+    return submit_job(extract_audio_for_whisper, digest, video_bytes, suffix, CACHE_VERSION)
+
+
+def _transcribe_file_job(audio_path: Path, backend: str) -> list[dict]:
+    # Skrót liczony w wątku w tle, strumieniowo — bez kopii pliku w pamięci
+    return transcribe_audio(file_digest(audio_path), audio_path, backend, CACHE_VERSION)
+
+
+def submit_transcription_job(audio_path: Path, backend: str) -> str:
+    return submit_job(_transcribe_file_job, audio_path, backend)
+
+
+def get_job_result(job_id: str):
+    return get_worker().result(job_id)
+
+
+def job_done(job_id: str | None) -> bool:
+    return not job_id or get_worker().done(job_id)
+
+
+def discard_job(job_id: str | None) -> None:
+    if job_id:
+        get_worker().discard(job_id)